@@ -1,14 +1,14 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import threading
 import time
-from dataclasses import dataclass
 
 import cv2
 import numpy as np
 import rospy
 from cv_bridge import CvBridge
-from sensor_msgs.msg import Image
+from sensor_msgs.msg import CompressedImage, Image
 
 # Import custom message (generated at build time)
 try:
@@ -18,6 +18,27 @@ except ImportError:
     HAS_STATS_MSG = False
     rospy.logwarn("PreprocessStats message not found. Stats publishing disabled.")
 
+# Optional JIT stats kernel (falls back to the OpenCV histogram path)
+try:
+    from numba import njit, prange
+    HAS_NUMBA = True
+except ImportError:
+    HAS_NUMBA = False
+
+# Optional libjpeg-turbo encoder for the compressed output (falls back to cv2.imencode)
+try:
+    from turbojpeg import TurboJPEG
+    HAS_TURBOJPEG = True
+except ImportError:
+    HAS_TURBOJPEG = False
+
+
+# Spacing of the precomputed gamma LUT palette (gamma_min + k * resolution).
+# Auto-tune snaps gamma to this grid, so tuned values always hit a table.
+GAMMA_LUT_RESOLUTION = 0.01
+
+# Gamma this close to 1.0 is treated as identity and the LUT pass is skipped
+GAMMA_IDENTITY_EPS = 0.01
 
 # Preset definitions
 PRESETS = {
@@ -44,19 +65,42 @@ PRESETS = {
 }
 
 
-@dataclass
-class BrightnessStats:
-    mean: float = 0.0
-    std: float = 0.0
-    sat_ratio: float = 0.0  # ratio of pixels > sat_thr
-    dark_ratio: float = 0.0  # ratio of pixels < dark_thr
+if HAS_NUMBA:
+    @njit(parallel=True, fastmath=True)
+    def _stats_kernel(gray, sat_thr, dark_thr):
+        """Fused single-pass mean / std / sat_ratio / dark_ratio over a gray image."""
+        h, w = gray.shape
+        total = 0.0
+        total_sq = 0.0
+        sat = 0
+        dark = 0
+        for y in prange(h):
+            for x in range(w):
+                v = float(gray[y, x])
+                total += v
+                total_sq += v * v
+                if v > sat_thr:
+                    sat += 1
+                if v < dark_thr:
+                    dark += 1
+        n = h * w
+        mean = total / n
+        var = max(total_sq / n - mean * mean, 0.0)
+        return mean, np.sqrt(var), sat / n, dark / n
+
+
+# Brightness stats are packed into a float32[4] vector in this order
+STAT_MEAN = 0
+STAT_STD = 1
+STAT_SAT = 2  # ratio of pixels > sat_thr
+STAT_DARK = 3  # ratio of pixels < dark_thr
 
 
 class PreprocessNode:
     """
     Image preprocess for illumination robustness:
       - Gamma correction (optional)
-      - CLAHE on L channel (optional)
+      - CLAHE on Y channel (optional)
 
     Features:
       - Preset configurations for common lighting scenarios
@@ -78,12 +122,19 @@ class PreprocessNode:
         self.debug_topic = rospy.get_param("~debug_topic", "/camera/image_preprocess_debug")
         self.stats_topic = rospy.get_param("~stats_topic", "/camera/image_preprocess_stats")
 
+        # Subscriber receive buffer; must hold a full frame or rospy queues stale ones in the socket
+        self.buff_size = int(rospy.get_param("~buff_size", 2 ** 25))
+
         # Enable flags
         self.debug_enable = bool(rospy.get_param("~debug_enable", False))
         self.debug_histogram = bool(rospy.get_param("~debug_histogram", False))
+        self.debug_width = int(rospy.get_param("~debug_width", 640))
         self.stats_enable = bool(rospy.get_param("~stats_enable", True))
         self.gamma_enable = bool(rospy.get_param("~gamma_enable", True))
         self.clahe_enable = bool(rospy.get_param("~clahe_enable", True))
+        self.opencl_enable = bool(rospy.get_param("~opencl_enable", False))
+        self.publish_compressed = bool(rospy.get_param("~publish_compressed", False))
+        self.jpeg_quality = int(rospy.get_param("~jpeg_quality", 85))
 
         # Preprocess base params (may be overridden by preset)
         self.gamma = float(rospy.get_param("~gamma", self._preset_defaults.get("gamma", 1.10)))
@@ -107,6 +158,9 @@ class PreprocessNode:
         self.sat_ratio_thr = float(rospy.get_param("~sat_ratio_thr", 0.12))
         self.dark_ratio_thr = float(rospy.get_param("~dark_ratio_thr", 0.12))
 
+        # Brightness stats are computed on every N-th pixel in each axis
+        self.stats_downsample = int(rospy.get_param("~stats_downsample", 4))
+
         # Auto tuning step sizes
         self.gamma_step = float(rospy.get_param("~gamma_step", 0.05))
         self.gamma_step_saturated = float(rospy.get_param("~gamma_step_saturated", 0.08))
@@ -120,6 +174,7 @@ class PreprocessNode:
 
         # Rate limiting
         self.update_every_n = int(rospy.get_param("~auto_tune_update_every_n", 8))
+        # Auto-tune runs on a timer with this period (seconds), off the image thread
         self.min_update_interval = float(rospy.get_param("~auto_tune_min_update_interval", 0.25))
 
         # Smoothing (EMA)
@@ -127,6 +182,8 @@ class PreprocessNode:
 
         # Performance monitoring
         self.warn_frame_time_ms = float(rospy.get_param("~warn_frame_time_ms", 30.0))
+        # Frames older than this (seconds, by header stamp) are dropped; <= 0 disables
+        self.max_latency = float(rospy.get_param("~max_latency", 0.1))
 
         # Quality thresholds
         self.blur_threshold = float(rospy.get_param("~blur_threshold", 100.0))
@@ -136,24 +193,74 @@ class PreprocessNode:
         # Validate parameters
         self._validate_params()
 
+        # JIT-compile the stats kernel now rather than on the first frame
+        if HAS_NUMBA:
+            _stats_kernel(np.zeros((8, 8), dtype=np.uint8), self.sat_thr, self.dark_thr)
+
+        # OpenCL (T-API) for the UMat path
+        if self.opencl_enable:
+            cv2.ocl.setUseOpenCL(True)
+
+        # Gamma LUT palette over the auto-tune range, so tuning never rebuilds a table
+        n_luts = int(np.floor((self.gamma_max - self.gamma_min) / GAMMA_LUT_RESOLUTION + 1e-6)) + 1
+        self._gamma_grid = self.gamma_min + GAMMA_LUT_RESOLUTION * np.arange(n_luts)
+        self._gamma_luts = [self._build_gamma_lut(g) for g in self._gamma_grid]
+
+        # CLAHE handle is reused across frames; only its clip limit follows auto-tune
+        self._clahe = cv2.createCLAHE(clipLimit=self.clahe_clip,
+                                      tileGridSize=(self.clahe_grid, self.clahe_grid))
+
         # Publishers and subscribers
         self.bridge = CvBridge()
         self.pub = rospy.Publisher(self.output_topic, Image, queue_size=1)
         self.pub_dbg = rospy.Publisher(self.debug_topic, Image, queue_size=1) if self.debug_enable else None
 
+        # Compressed output follows the image_transport "<topic>/compressed" convention
+        self._jpeg = None
+        if self.publish_compressed:
+            self.pub_compressed = rospy.Publisher(self.output_topic + "/compressed", CompressedImage,
+                                                  queue_size=1)
+            if HAS_TURBOJPEG:
+                try:
+                    self._jpeg = TurboJPEG()
+                except (OSError, RuntimeError) as e:
+                    rospy.logwarn("TurboJPEG unavailable (%s). Using cv2.imencode.", e)
+        else:
+            self.pub_compressed = None
+
         if self.stats_enable and HAS_STATS_MSG:
             self.pub_stats = rospy.Publisher(self.stats_topic, PreprocessStats, queue_size=1)
         else:
             self.pub_stats = None
 
-        self.sub = rospy.Subscriber(self.input_topic, Image, self.cb, queue_size=1)
-
         # State
         self._frame = 0
-        self._last_update_t = 0.0
-        self._ema = BrightnessStats()
+        self._last_stats_frame = 0
+        self._ema = np.zeros(4, dtype=np.float32)
+        self._ema_lock = threading.Lock()
+        self._ema_seq = 0  # bumped on every EMA update
+        self._tuned_seq = 0  # _ema_seq seen by the last auto-tune tick
+        self._clahe_clip_applied = self.clahe_clip
         self._last_blur_score = 0.0
         self._last_frame_time_ms = 0.0
+        self._gamma_lut = None
+        self._gamma_lut_key = None
+        self._hist_bins = np.arange(256, dtype=np.float64)
+        self._buf_shape = None
+        self._ycc = None
+        self._out = None
+        self._y_in = None
+        self._y_out = None
+
+        # Auto-tune runs off the image thread; the callback only feeds the EMA
+        if self.auto_tune_enable:
+            self._tune_timer = rospy.Timer(rospy.Duration(self.min_update_interval), self._auto_tune_cb)
+        else:
+            self._tune_timer = None
+
+        # Subscribe last so the callback never sees a half-initialized node
+        self.sub = rospy.Subscriber(self.input_topic, Image, self.cb, queue_size=1,
+                                    buff_size=self.buff_size)
 
         # Log startup info
         rospy.loginfo("image_preprocess ready:")
@@ -163,6 +270,10 @@ class PreprocessNode:
                       self.gamma, self.gamma_enable, self.clahe_clip, self.clahe_enable)
         rospy.loginfo("  auto_tune=%s, stats=%s, debug=%s",
                       self.auto_tune_enable, self.stats_enable, self.debug_enable)
+        rospy.loginfo("  stats kernel=%s", "numba" if HAS_NUMBA else "opencv")
+        if self.publish_compressed:
+            rospy.loginfo("  compressed=%s/compressed (encoder=%s, quality=%d)", self.output_topic,
+                          "turbojpeg" if self._jpeg is not None else "opencv", self.jpeg_quality)
 
     def _load_preset(self):
         """Load preset configuration if specified."""
@@ -202,83 +313,139 @@ class PreprocessNode:
             self.gamma_min = 0.70
             self.gamma_max = 1.60
 
+        # Tuned gamma is snapped to the LUT grid; a smaller nonzero step would snap back
+        # to no change. A step of 0 is left alone (it freezes gamma during auto-tune).
+        if 0 < self.gamma_step < GAMMA_LUT_RESOLUTION:
+            rospy.logwarn("gamma_step=%.3f is < %.2f, setting to %.2f",
+                          self.gamma_step, GAMMA_LUT_RESOLUTION, GAMMA_LUT_RESOLUTION)
+            self.gamma_step = GAMMA_LUT_RESOLUTION
+        if 0 < self.gamma_step_saturated < GAMMA_LUT_RESOLUTION:
+            rospy.logwarn("gamma_step_saturated=%.3f is < %.2f, setting to %.2f",
+                          self.gamma_step_saturated, GAMMA_LUT_RESOLUTION, GAMMA_LUT_RESOLUTION)
+            self.gamma_step_saturated = GAMMA_LUT_RESOLUTION
+
         if self.clahe_min >= self.clahe_max:
             rospy.logerr("clahe_min >= clahe_max. Using defaults.")
             self.clahe_min = 1.2
             self.clahe_max = 3.8
 
+        # Pixel thresholds index the 256-bin histogram
+        if not 0 <= self.sat_thr <= 255:
+            rospy.logwarn("sat_thr=%d is outside [0, 255], clipping", self.sat_thr)
+            self.sat_thr = int(np.clip(self.sat_thr, 0, 255))
+        if not 0 <= self.dark_thr <= 255:
+            rospy.logwarn("dark_thr=%d is outside [0, 255], clipping", self.dark_thr)
+            self.dark_thr = int(np.clip(self.dark_thr, 0, 255))
+
+        if self.update_every_n < 1:
+            rospy.logwarn("auto_tune_update_every_n=%d is < 1, setting to 1", self.update_every_n)
+            self.update_every_n = 1
+
+        if self.stats_downsample < 1:
+            rospy.logwarn("stats_downsample=%d is < 1, setting to 1", self.stats_downsample)
+            self.stats_downsample = 1
+
+        # OpenCL (T-API) availability
+        if self.opencl_enable and not cv2.ocl.haveOpenCL():
+            rospy.logwarn("opencl_enable=true but OpenCL is not available. Using CPU path.")
+            self.opencl_enable = False
+
+        if self.min_update_interval <= 0:
+            rospy.logwarn("auto_tune_min_update_interval=%.2f is invalid. Setting to 0.25",
+                          self.min_update_interval)
+            self.min_update_interval = 0.25
+
+        if not 1 <= self.jpeg_quality <= 100:
+            rospy.logwarn("jpeg_quality=%d is outside [1, 100], clipping", self.jpeg_quality)
+            self.jpeg_quality = int(np.clip(self.jpeg_quality, 1, 100))
+
         # EMA validation
         if self.ema_alpha <= 0 or self.ema_alpha > 1:
             rospy.logwarn("ema_alpha=%.2f is invalid. Setting to 0.15", self.ema_alpha)
             self.ema_alpha = 0.15
 
-    def _compute_stats(self, bgr: np.ndarray) -> BrightnessStats:
-        """Compute brightness statistics from image."""
-        gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
-        mean = float(gray.mean())
-        std = float(gray.std())
-        sat_ratio = float(np.mean(gray > self.sat_thr))
-        dark_ratio = float(np.mean(gray < self.dark_thr))
-        return BrightnessStats(mean=mean, std=std, sat_ratio=sat_ratio, dark_ratio=dark_ratio)
+    def _compute_stats(self, bgr: np.ndarray) -> np.ndarray:
+        """Compute brightness statistics from a decimated copy of the image."""
+        k = self.stats_downsample
+        gray = cv2.cvtColor(bgr[::k, ::k], cv2.COLOR_BGR2GRAY)
+
+        if HAS_NUMBA:
+            return np.array(_stats_kernel(gray, self.sat_thr, self.dark_thr), dtype=np.float32)
+
+        # OpenCV fallback: single pass over the pixels, everything else from the histogram
+        hist = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel()
+        n = float(gray.size)
+        bins = self._hist_bins
+        mean = float(hist @ bins) / n
+        std = float(np.sqrt((hist @ (bins - mean) ** 2) / n))
+        sat_ratio = float(hist[self.sat_thr + 1:].sum()) / n
+        dark_ratio = float(hist[:self.dark_thr].sum()) / n
+        return np.array([mean, std, sat_ratio, dark_ratio], dtype=np.float32)
 
     def _compute_blur_score(self, bgr: np.ndarray) -> float:
         """Compute blur score using Laplacian variance. Higher = sharper."""
         gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
         return float(cv2.Laplacian(gray, cv2.CV_64F).var())
 
-    def _ema_update(self, s: BrightnessStats):
-        """Update EMA statistics."""
-        a = self.ema_alpha
-        self._ema.mean = (1 - a) * self._ema.mean + a * s.mean
-        self._ema.std = (1 - a) * self._ema.std + a * s.std
-        self._ema.sat_ratio = (1 - a) * self._ema.sat_ratio + a * s.sat_ratio
-        self._ema.dark_ratio = (1 - a) * self._ema.dark_ratio + a * s.dark_ratio
+    def _stats_due(self) -> bool:
+        """Return True if brightness stats are needed on this frame."""
+        if (self._frame % self.update_every_n) != 0:
+            return False
+        # Without auto-tune the EMA is only consumed by the stats/debug outputs
+        return self.auto_tune_enable or self.pub_stats is not None or self.pub_dbg is not None
 
-    def _auto_tune(self):
+    def _ema_update(self, s: np.ndarray, frames: int = 1):
+        """
+        Update EMA statistics.
+        `frames` is the number of frames since the last sample; alpha is
+        compounded so the smoothing time constant stays in frames.
+        """
+        a = np.float32(1.0 - (1.0 - self.ema_alpha) ** max(1, frames))
+        with self._ema_lock:
+            self._ema += a * (s - self._ema)
+            self._ema_seq += 1
+
+    def _auto_tune_cb(self, event):
+        """Timer callback: run auto-tune once per new EMA sample."""
+        with self._ema_lock:
+            if self._ema_seq == self._tuned_seq:
+                return
+            self._tuned_seq = self._ema_seq
+            ema = self._ema.tolist()
+        self._auto_tune(*ema)
+
+    def _auto_tune(self, mean: float, std: float, sat: float, dark: float):
         """
         Adjust gamma & CLAHE based on EMA stats.
-        Safe, small steps, bounded, rate-limited.
+        Safe, small steps, bounded. Rate-limited by the auto-tune timer.
         """
-        now = time.time()
-        if (self._frame % self.update_every_n) != 0:
-            return
-        if (now - self._last_update_t) < self.min_update_interval:
-            return
 
-        mean = self._ema.mean
-        std = self._ema.std
-        sat = self._ema.sat_ratio
-        dark = self._ema.dark_ratio
+        # Scene classification as 0/1 weights; the rules below are branch-free
+        hot = float(sat > self.sat_ratio_thr)
+        cool = 1.0 - hot
+        dark_scene = float((mean < self.dark_mean_thr) | (dark > self.dark_ratio_thr))
+        bright_scene = (1.0 - dark_scene) * (mean > self.bright_mean_thr)
+        low_contrast = float(std < self.low_contrast_std_thr)
 
-        gamma = self.gamma
-        clahe = self.clahe_clip
+        # Outside low contrast, relax clahe toward a target band
+        target = 2.3
+        above = float(self.clahe_clip > target + 0.2)
+        below = float(self.clahe_clip < target - 0.2)
 
-        # Priority: saturation (white-out) first
-        if sat > self.sat_ratio_thr:
-            gamma = max(self.gamma_min, gamma - self.gamma_step_saturated)
-            clahe = max(self.clahe_min, clahe - self.clahe_step)
-        else:
-            # Dark / bright control
-            if mean < self.dark_mean_thr or dark > self.dark_ratio_thr:
-                gamma = min(self.gamma_max, gamma + self.gamma_step)
-            elif mean > self.bright_mean_thr:
-                gamma = max(self.gamma_min, gamma - self.gamma_step)
-
-            # Contrast control (gentle)
-            if std < self.low_contrast_std_thr:
-                clahe = min(self.clahe_max, clahe + self.clahe_step)
-            else:
-                target = 2.3
-                if clahe > target + 0.2:
-                    clahe = max(self.clahe_min, clahe - self.clahe_step * 0.5)
-                elif clahe < target - 0.2:
-                    clahe = min(self.clahe_max, clahe + self.clahe_step * 0.3)
+        # Priority: saturation (white-out) overrides dark/bright and contrast control
+        gamma_delta = (-hot * self.gamma_step_saturated
+                       + cool * (dark_scene - bright_scene) * self.gamma_step)
+        clahe_delta = self.clahe_step * (
+            -hot
+            + cool * (low_contrast + (1.0 - low_contrast) * (0.3 * below - 0.5 * above)))
+
+        gamma = self._snap_gamma(min(max(self.gamma + gamma_delta, self.gamma_min), self.gamma_max))
+        clahe = min(max(self.clahe_clip + clahe_delta, self.clahe_min), self.clahe_max)
 
         # Apply
         if (abs(gamma - self.gamma) > 1e-6) or (abs(clahe - self.clahe_clip) > 1e-6):
-            self.gamma = float(np.clip(gamma, self.gamma_min, self.gamma_max))
-            self.clahe_clip = float(np.clip(clahe, self.clahe_min, self.clahe_max))
-            self._last_update_t = now
+            self.gamma = gamma
+            self.clahe_clip = clahe
 
             rospy.loginfo_throttle(
                 1.0,
@@ -287,24 +454,98 @@ class PreprocessNode:
             )
 
     @staticmethod
-    def _apply_gamma(bgr: np.ndarray, gamma: float) -> np.ndarray:
+    def _build_gamma_lut(gamma: float) -> np.ndarray:
+        """Build a 256-entry uint8 gamma LUT."""
+        inv = 1.0 / gamma
+        return (np.linspace(0, 1, 256) ** inv * 255.0).astype(np.uint8)
+
+    def _snap_gamma(self, gamma: float) -> float:
+        """Snap gamma to the nearest entry of the LUT palette."""
+        idx = int(round((gamma - self.gamma_min) / GAMMA_LUT_RESOLUTION))
+        return float(self._gamma_grid[min(max(idx, 0), len(self._gamma_grid) - 1)])
+
+    def _gamma_lut_for(self, gamma: float) -> np.ndarray:
+        """
+        Return the gamma LUT from the precomputed palette.
+        Off-grid values (a fixed or initial gamma not on the grid, or one
+        outside the tuning bounds) use a single cached table rebuilt only
+        when gamma changes.
+        """
+        idx = int(round((gamma - self.gamma_min) / GAMMA_LUT_RESOLUTION))
+        if 0 <= idx < len(self._gamma_luts) and abs(self._gamma_grid[idx] - gamma) < 1e-4:
+            return self._gamma_luts[idx]
+
+        key = round(gamma, 4)
+        if key != self._gamma_lut_key:
+            self._gamma_lut = self._build_gamma_lut(gamma)
+            self._gamma_lut_key = key
+        return self._gamma_lut
+
+    def _ensure_buffers(self, shape: tuple):
+        """(Re)allocate the per-frame work buffers when the input size changes."""
+        if shape == self._buf_shape:
+            return
+        self._buf_shape = shape
+        self._ycc = np.empty(shape, dtype=np.uint8)
+        self._out = np.empty(shape, dtype=np.uint8)
+        self._y_in = np.empty(shape[:2], dtype=np.uint8)
+        self._y_out = np.empty(shape[:2], dtype=np.uint8)
+
+    def _apply_gamma(self, bgr: np.ndarray, gamma: float, dst: np.ndarray = None) -> np.ndarray:
         """Apply gamma correction using LUT."""
         if gamma <= 0:
             return bgr
-        inv = 1.0 / gamma
-        table = (np.linspace(0, 1, 256) ** inv * 255.0).astype(np.uint8)
-        return cv2.LUT(bgr, table)
+        return cv2.LUT(bgr, self._gamma_lut_for(gamma), dst=dst)
 
-    @staticmethod
-    def _apply_clahe(bgr: np.ndarray, clip: float, grid: int) -> np.ndarray:
-        """Apply CLAHE on L channel in LAB color space."""
-        grid = max(2, int(grid))
-        lab = cv2.cvtColor(bgr, cv2.COLOR_BGR2LAB)
-        l_ch, a_ch, b_ch = cv2.split(lab)
-        clahe = cv2.createCLAHE(clipLimit=float(clip), tileGridSize=(grid, grid))
-        l_ch = clahe.apply(l_ch)
-        lab = cv2.merge([l_ch, a_ch, b_ch])
-        return cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
+    def _apply_clahe(self, bgr: np.ndarray, y_lut: np.ndarray = None) -> np.ndarray:
+        """
+        Apply an optional LUT on Y, then CLAHE on Y channel in YCrCb color space.
+        Works in the buffers from _ensure_buffers(); the result is self._out.
+        """
+        ycc = cv2.cvtColor(bgr, cv2.COLOR_BGR2YCrCb, dst=self._ycc)
+        # Only the Y plane is copied out (CLAHE needs contiguous input) and written back;
+        # Cr/Cb stay in place instead of going through split/merge. Gamma is one extra
+        # single-plane LUT pass, done in place on the extracted copy.
+        cv2.extractChannel(ycc, 0, dst=self._y_in)
+        if y_lut is not None:
+            cv2.LUT(self._y_in, y_lut, dst=self._y_in)
+        ycc[:, :, 0] = self._clahe.apply(self._y_in, dst=self._y_out)
+        return cv2.cvtColor(ycc, cv2.COLOR_YCrCb2BGR, dst=self._out)
+
+    def _apply_clahe_umat(self, src: cv2.UMat, y_lut: np.ndarray = None) -> cv2.UMat:
+        """OpenCL variant of _apply_clahe. UMat has no slicing, so Y is moved with extract/insertChannel."""
+        ycc = cv2.cvtColor(src, cv2.COLOR_BGR2YCrCb)
+        y_ch = cv2.extractChannel(ycc, 0)
+        if y_lut is not None:
+            y_ch = cv2.LUT(y_ch, y_lut)
+        ycc = cv2.insertChannel(self._clahe.apply(y_ch), ycc, 0)
+        return cv2.cvtColor(ycc, cv2.COLOR_YCrCb2BGR)
+
+    def _preprocess(self, bgr: np.ndarray) -> np.ndarray:
+        """
+        Apply the enabled corrections.
+        With CLAHE on, gamma is applied to the Y channel ahead of CLAHE, so
+        the frame goes through a single YCrCb round-trip and no 3-channel LUT.
+        With opencl_enable the whole chain runs on a UMat and is
+        downloaded once at the end. The CPU path returns a buffer that is
+        reused on the next frame.
+        """
+        use_gamma = (self.gamma_enable and self.gamma > 0
+                     and abs(self.gamma - 1.0) >= GAMMA_IDENTITY_EPS)
+        if not (self.clahe_enable or use_gamma):
+            return bgr
+        y_lut = self._gamma_lut_for(self.gamma) if use_gamma else None
+
+        if self.opencl_enable:
+            src = cv2.UMat(bgr)
+            if self.clahe_enable:
+                return self._apply_clahe_umat(src, y_lut).get()
+            return self._apply_gamma(src, self.gamma).get()
+
+        self._ensure_buffers(bgr.shape)
+        if self.clahe_enable:
+            return self._apply_clahe(bgr, y_lut)
+        return self._apply_gamma(bgr, self.gamma, dst=self._out)
 
     def _draw_histogram(self, img: np.ndarray, x: int, y: int, w: int, h: int) -> np.ndarray:
         """Draw histogram overlay on image."""
@@ -333,53 +574,99 @@ class PreprocessNode:
 
         msg = PreprocessStats()
         msg.header = header
-        msg.mean_luma = self._ema.mean
-        msg.std_luma = self._ema.std
-        msg.sat_ratio = self._ema.sat_ratio
-        msg.dark_ratio = self._ema.dark_ratio
+        msg.mean_luma, msg.std_luma, msg.sat_ratio, msg.dark_ratio = self._ema.tolist()
         msg.current_gamma = self.gamma
         msg.current_clahe_clip = self.clahe_clip
         msg.frame_time_ms = frame_time_ms
         msg.blur_score = self._last_blur_score
-        msg.is_overexposed = self._ema.sat_ratio > self.overexpose_ratio
-        msg.is_underexposed = self._ema.dark_ratio > self.underexpose_ratio
+        msg.is_overexposed = bool(self._ema[STAT_SAT] > self.overexpose_ratio)
+        msg.is_underexposed = bool(self._ema[STAT_DARK] > self.underexpose_ratio)
 
         self.pub_stats.publish(msg)
 
+    def _imgmsg_to_bgr(self, msg: Image) -> np.ndarray:
+        """
+        Wrap a bgr8 message payload as a read-only ndarray view (no copy).
+        Other encodings are converted through cv_bridge.
+        """
+        if msg.encoding != "bgr8":
+            return self.bridge.imgmsg_to_cv2(msg, "bgr8")
+        rows = np.frombuffer(msg.data, dtype=np.uint8).reshape(msg.height, msg.step)
+        return rows[:, :msg.width * 3].reshape(msg.height, msg.width, 3)
+
+    @staticmethod
+    def _bgr_to_imgmsg(bgr: np.ndarray, header) -> Image:
+        """Build a bgr8 Image message directly, bypassing cv_bridge."""
+        out_msg = Image()
+        out_msg.header = header
+        out_msg.height, out_msg.width = bgr.shape[:2]
+        out_msg.encoding = "bgr8"
+        out_msg.is_bigendian = 0
+        out_msg.step = out_msg.width * 3
+        out_msg.data = bgr.tobytes()
+        return out_msg
+
+    def _bgr_to_compressed(self, bgr: np.ndarray, header) -> CompressedImage:
+        """Encode a bgr8 frame as a JPEG CompressedImage (libjpeg-turbo if available)."""
+        out_msg = CompressedImage()
+        out_msg.header = header
+        out_msg.format = "bgr8; jpeg compressed bgr8"
+        if self._jpeg is not None:
+            out_msg.data = self._jpeg.encode(np.ascontiguousarray(bgr), quality=self.jpeg_quality)
+        else:
+            _, buf = cv2.imencode(".jpg", bgr, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+            out_msg.data = buf.tobytes()
+        return out_msg
+
     def cb(self, msg: Image):
         """Image callback - main processing pipeline."""
+        # Drop frames that are already stale instead of adding to the backlog
+        if self.max_latency > 0 and not msg.header.stamp.is_zero():
+            age = (rospy.Time.now() - msg.header.stamp).to_sec()
+            if age > self.max_latency:
+                rospy.logwarn_throttle(1.0, "Dropping stale frame: age %.3f s (max_latency: %.3f s)",
+                                       age, self.max_latency)
+                return
+
         self._frame += 1
+
+        # An undersized receive buffer silently adds latency; make it visible
+        if msg.step * msg.height > self.buff_size:
+            rospy.logwarn_once("buff_size=%d is smaller than one frame (%d bytes). Frames will queue up.",
+                               self.buff_size, msg.step * msg.height)
         t_start = time.time()
 
         try:
-            bgr = self.bridge.imgmsg_to_cv2(msg, "bgr8")
+            bgr = self._imgmsg_to_bgr(msg)
         except Exception as e:
             rospy.logerr("cv_bridge error: %s", e)
             return
 
-        # Compute statistics on raw image
-        s = self._compute_stats(bgr)
-        self._ema_update(s)
+        # Compute statistics on raw image (only on frames that can use them)
+        if self._stats_due():
+            s = self._compute_stats(bgr)
+            self._ema_update(s, self._frame - self._last_stats_frame)
+            self._last_stats_frame = self._frame
 
         # Compute blur score (periodically to save CPU)
         if self._frame % 5 == 0:
             self._last_blur_score = self._compute_blur_score(bgr)
 
-        # Auto tune if enabled
-        if self.auto_tune_enable:
-            self._auto_tune()
+        # Pick up clip limit changes from auto-tune; the CLAHE object is only used on this thread
+        clip = self.clahe_clip
+        if clip != self._clahe_clip_applied:
+            self._clahe.setClipLimit(clip)
+            self._clahe_clip_applied = clip
 
         # Apply preprocessing
-        out = bgr
-        if self.gamma_enable:
-            out = self._apply_gamma(out, self.gamma)
-        if self.clahe_enable:
-            out = self._apply_clahe(out, self.clahe_clip, self.clahe_grid)
+        out = self._preprocess(bgr)
 
         # Publish output
-        out_msg = self.bridge.cv2_to_imgmsg(out, "bgr8")
-        out_msg.header = msg.header
-        self.pub.publish(out_msg)
+        # Raw message is only serialized if someone listens to it
+        if self.pub.get_num_connections() > 0:
+            self.pub.publish(self._bgr_to_imgmsg(out, msg.header))
+        if self.pub_compressed is not None and self.pub_compressed.get_num_connections() > 0:
+            self.pub_compressed.publish(self._bgr_to_compressed(out, msg.header))
 
         # Compute frame time
         t_end = time.time()
@@ -397,14 +684,21 @@ class PreprocessNode:
 
         # Debug overlay
         if self.debug_enable and self.pub_dbg is not None:
-            dbg = out.copy()
+            # Overlay is drawn on a downscaled copy to keep the debug path cheap
+            h, w = out.shape[:2]
+            if 0 < self.debug_width < w:
+                dbg = cv2.resize(out, (self.debug_width, h * self.debug_width // w),
+                                 interpolation=cv2.INTER_AREA)
+            else:
+                dbg = out.copy()
 
             # Text overlay
             y_pos = 25
             cv2.putText(dbg, f"gamma={self.gamma:.2f} clahe={self.clahe_clip:.2f} grid={self.clahe_grid}",
                         (10, y_pos), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2, cv2.LINE_AA)
             y_pos += 25
-            cv2.putText(dbg, f"mean={self._ema.mean:.1f} std={self._ema.std:.1f} sat={self._ema.sat_ratio:.2f} dark={self._ema.dark_ratio:.2f}",
+            mean, std, sat, dark = self._ema.tolist()
+            cv2.putText(dbg, f"mean={mean:.1f} std={std:.1f} sat={sat:.2f} dark={dark:.2f}",
                         (10, y_pos), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 255), 1, cv2.LINE_AA)
             y_pos += 20
             cv2.putText(dbg, f"blur={self._last_blur_score:.1f} time={frame_time_ms:.1f}ms",
@@ -413,9 +707,9 @@ class PreprocessNode:
             # Quality warnings
             y_pos += 20
             warnings = []
-            if self._ema.sat_ratio > self.overexpose_ratio:
+            if sat > self.overexpose_ratio:
                 warnings.append("OVEREXPOSED")
-            if self._ema.dark_ratio > self.underexpose_ratio:
+            if dark > self.underexpose_ratio:
                 warnings.append("UNDEREXPOSED")
             if self._last_blur_score < self.blur_threshold:
                 warnings.append("BLURRY")
@@ -429,9 +723,7 @@ class PreprocessNode:
                 hist_w, hist_h = 200, 80
                 self._draw_histogram(dbg, w - hist_w - 10, 10, hist_w, hist_h)
 
-            dbg_msg = self.bridge.cv2_to_imgmsg(dbg, "bgr8")
-            dbg_msg.header = msg.header
-            self.pub_dbg.publish(dbg_msg)
+            self.pub_dbg.publish(self._bgr_to_imgmsg(dbg, msg.header))
 
 
 if __name__ == "__main__":